@@ -4,9 +4,9 @@ kasa-scan — Discover, monitor, and control TP-Link Kasa smart home devices.
 
 Subcommands:
   scan       Discover devices on the network (default if omitted)
-  on         Turn a device on by name or IP
-  off        Turn a device off by name or IP
-  toggle     Toggle a device by name or IP
+  on         Turn devices on by name or IP
+  off        Turn devices off by name or IP
+  toggle     Toggle devices by name or IP
   watch      Live-updating device monitor
   baseline   Save current device list for diff comparison
   diff       Compare current devices to saved baseline
@@ -14,15 +14,26 @@ Subcommands:
 
 import argparse
 import asyncio
+import atexit
+import contextlib
 import csv
 import io
+import ipaddress
 import json
 import os
+import socket
 import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
-from kasa import Discover
+# python-kasa (and its aiohttp/cryptography stack) is imported inside the
+# functions that talk to devices, so --help and argument errors stay fast.
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used instead
+    orjson = None
 
 # ---------------------------------------------------------------------------
 # Paths
@@ -32,6 +43,7 @@ DATA_DIR = Path.home() / ".kasa_scan"
 DEVICES_CSV = DATA_DIR / "devices.csv"
 SCAN_LOG = DATA_DIR / "scan_log.csv"
 BASELINE_FILE = DATA_DIR / "baseline.json"
+NAME_CACHE = DATA_DIR / "name_cache.csv"
 
 
 def _ensure_data_dir() -> None:
@@ -51,6 +63,25 @@ def _safe(obj, attr, default=None):
         return default
 
 
+_UTC = timezone.utc
+
+
+def _now_iso() -> str:
+    """Current UTC time as an ISO-8601 string, as stored in CSV/JSON output."""
+    return datetime.now(_UTC).isoformat()
+
+
+def _json_dumps(obj) -> str:
+    """Indented JSON text, via orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def _json_loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
 def _clean_type(raw: str) -> str:
     """DeviceType.Plug → Plug"""
     return raw.replace("DeviceType.", "")
@@ -72,186 +103,478 @@ def _get_firmware(dev) -> str | None:
         return None
 
 
+# (output key, milli-unit emeter key, base-unit emeter key, rounding digits)
+_EMETER_METRICS = (
+    ("power_w", "power_mw", "power", 2),
+    ("voltage_v", "voltage_mv", "voltage", 1),
+    ("current_a", "current_ma", "current", 3),
+    ("total_kwh", "total_wh", "total", 3),
+)
+
+
 def _get_energy(dev) -> dict:
     """Return energy metrics for devices with an emeter."""
-    energy: dict = {
-        "power_w": None,
-        "voltage_v": None,
-        "current_a": None,
-        "total_kwh": None,
-    }
+    energy: dict = {out: None for out, _, _, _ in _EMETER_METRICS}
     try:
         if not getattr(dev, "has_emeter", False):
             return energy
         rt = dev.emeter_realtime
         if isinstance(rt, dict):
             # Some firmware reports milliwatts, some watts
-            energy["power_w"] = rt.get("power_mw", rt.get("power"))
-            if energy["power_w"] is not None and "power_mw" in rt:
-                energy["power_w"] = round(energy["power_w"] / 1000, 2)
-            energy["voltage_v"] = rt.get("voltage_mv", rt.get("voltage"))
-            if energy["voltage_v"] is not None and "voltage_mv" in rt:
-                energy["voltage_v"] = round(energy["voltage_v"] / 1000, 1)
-            energy["current_a"] = rt.get("current_ma", rt.get("current"))
-            if energy["current_a"] is not None and "current_ma" in rt:
-                energy["current_a"] = round(energy["current_a"] / 1000, 3)
-            energy["total_kwh"] = rt.get("total_wh", rt.get("total"))
-            if energy["total_kwh"] is not None and "total_wh" in rt:
-                energy["total_kwh"] = round(energy["total_kwh"] / 1000, 3)
+            for out, milli, unit, digits in _EMETER_METRICS:
+                val = rt.get(milli)
+                energy[out] = (
+                    round(val / 1000, digits) if val is not None else rt.get(unit)
+                )
         else:
-            energy["power_w"] = getattr(rt, "power", None)
-            energy["voltage_v"] = getattr(rt, "voltage", None)
-            energy["current_a"] = getattr(rt, "current", None)
-            energy["total_kwh"] = getattr(rt, "total", None)
+            for out, _, unit, _ in _EMETER_METRICS:
+                energy[out] = getattr(rt, unit, None)
     except Exception:
         pass
     return energy
 
 
+async def _settle(coro):
+    try:
+        return await coro
+    except Exception as e:
+        return e
+
+
+async def _gather_settled(coros) -> list:
+    """Run *coros* concurrently; each result is its value or the exception raised.
+
+    Uses a TaskGroup on 3.11+ so that cancellation (Ctrl-C) tears down every
+    in-flight task before this returns.
+    """
+    if sys.version_info >= (3, 11):
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(_settle(c)) for c in coros]
+        return [t.result() for t in tasks]
+    return await asyncio.gather(*coros, return_exceptions=True)
+
+
 # ---------------------------------------------------------------------------
 # Discovery
 # ---------------------------------------------------------------------------
 
-async def discover_devices(
+_GLOBAL_BROADCAST = "255.255.255.255"
+
+# Discover.discover_single's `timeout` only bounds queries; the wait for the
+# discovery reply is `discovery_timeout` (5s default), so direct probes pass
+# both for -t to take effect.
+
+# asyncio stalls UDP sends for seconds once ~64 destinations are waiting on
+# ARP resolution, so keep direct probes comfortably below that.
+DEFAULT_CONCURRENCY = 48
+
+
+def _broadcast_addresses() -> list[str]:
+    """Return the IPv4 broadcast address of every non-loopback interface.
+
+    Needs the optional ``psutil`` package; without it (or if no usable
+    interface is found) falls back to the global broadcast address.
+    """
+    try:
+        import psutil
+    except ImportError:
+        return [_GLOBAL_BROADCAST]
+
+    addrs: set[str] = set()
+    for snics in psutil.net_if_addrs().values():
+        for snic in snics:
+            if snic.family != socket.AF_INET or not snic.netmask:
+                continue
+            try:
+                iface = ipaddress.IPv4Interface(f"{snic.address}/{snic.netmask}")
+            except ValueError:
+                continue
+            if iface.is_loopback or iface.network.prefixlen >= 31:
+                continue
+            addrs.add(str(iface.network.broadcast_address))
+    return sorted(addrs) or [_GLOBAL_BROADCAST]
+
+
+async def _discover_broadcast(timeout: int = 5, on_discovered=None) -> dict:
+    """Broadcast on every interface at once and merge the results by IP."""
+    from kasa import Discover
+
+    results = await _gather_settled(
+        Discover.discover(target=bcast, timeout=timeout,
+                          on_discovered=on_discovered)
+        for bcast in _broadcast_addresses()
+    )
+    found: dict = {}
+    for res in results:
+        if isinstance(res, BaseException):
+            print(f"Discovery error: {res}", file=sys.stderr)
+            continue
+        for ip, dev in res.items():
+            found.setdefault(ip, dev)
+    return found
+
+
+async def _discover_range(
+    network: ipaddress.IPv4Network,
     timeout: int = 5,
-    target_ip: str | None = None,
-    include_energy: bool = False,
-) -> list[dict]:
-    """Discover Kasa devices and return enriched info dicts."""
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> dict:
+    """Probe every host in *network* directly, for segments broadcast can't reach.
 
-    if target_ip:
-        try:
-            dev = await Discover.discover_single(target_ip, timeout=timeout)
-            found = {target_ip: dev}
-        except Exception as e:
-            print(f"Error reaching {target_ip}: {e}", file=sys.stderr)
-            return []
-    else:
-        found = await Discover.discover(timeout=timeout)
+    A fixed pool of *concurrency* workers pulls addresses lazily from
+    network.hosts(), so even a /16 keeps only that many tasks alive.
+    """
+    from kasa import Discover
 
-    devices: list[dict] = []
+    hosts = iter(network.hosts())  # /32 and /31 return a list, not a generator
+    found: dict = {}
+
+    async def worker() -> None:
+        for addr in hosts:  # shared iterator; each next() hands out one host
+            ip = str(addr)
+            try:
+                found[ip] = await Discover.discover_single(
+                    ip, timeout=timeout, discovery_timeout=timeout,
+                )
+            except Exception:
+                pass
+
+    await _gather_settled(worker() for _ in range(concurrency))
+    return found
+
+
+async def _update_all(found: dict) -> list:
+    """Refresh every device at once; returns each result or exception."""
+    return await _gather_settled(dev.update() for dev in found.values())
+
+
+async def _disconnect_all(devs) -> None:
+    await _gather_settled(dev.disconnect() for dev in devs)
 
-    for ip, dev in found.items():
-        try:
-            await dev.update()
-        except Exception:
-            pass
 
-        info: dict = {
-            "name": _safe(dev, "alias", "Unknown"),
-            "mac": _safe(dev, "mac", "Unknown"),
+def _device_info(ip: str, dev) -> dict:
+    """Status fields for one device.
+
+    Attributes are read directly under a single try; only when one of them
+    raises (e.g. the device's update() failed) are they re-read through
+    _safe(), which swallows per-field errors.
+    """
+    try:
+        return {
+            "name": dev.alias or "Unknown",
+            "mac": dev.mac or "Unknown",
+            "ip": ip,
+            "model": dev.model or "Unknown",
+            "type": _clean_type(str(dev.device_type or "Unknown")),
+            "is_on": dev.is_on,
+            "rssi": _get_rssi(dev),
+            "brightness": getattr(dev, "brightness", None),
+            "firmware": _get_firmware(dev),
+        }
+    except Exception:
+        return {
+            "name": _safe(dev, "alias") or "Unknown",
+            "mac": _safe(dev, "mac") or "Unknown",
             "ip": ip,
-            "model": _safe(dev, "model", "Unknown"),
-            "type": _clean_type(str(_safe(dev, "device_type", "Unknown"))),
+            "model": _safe(dev, "model") or "Unknown",
+            "type": _clean_type(str(_safe(dev, "device_type") or "Unknown")),
             "is_on": _safe(dev, "is_on"),
             "rssi": _get_rssi(dev),
             "brightness": _safe(dev, "brightness"),
             "firmware": _get_firmware(dev),
         }
 
+
+def _build_infos(found: dict, include_energy: bool = False) -> list[dict]:
+    """Turn already-updated devices into info dicts, sorted by name."""
+    devices: list[dict] = []
+
+    for ip, dev in found.items():
+        info = _device_info(ip, dev)
+
         if include_energy:
             info.update(_get_energy(dev))
 
         devices.append(info)
 
+    return sorted(devices, key=lambda d: (d["name"] or "").lower())
+
+
+async def discover_devices(
+    timeout: int = 5,
+    target_ip: str | None = None,
+    include_energy: bool = False,
+    target_range: ipaddress.IPv4Network | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> list[dict]:
+    """Discover Kasa devices and return enriched info dicts."""
+
+    if target_ip:
+        from kasa import Discover
+
         try:
-            await dev.disconnect()
-        except Exception:
-            pass
+            dev = await Discover.discover_single(target_ip, timeout=timeout)
+            found = {target_ip: dev}
+        except Exception as e:
+            print(f"Error reaching {target_ip}: {e}", file=sys.stderr)
+            return []
+    elif target_range:
+        found = await _discover_range(
+            target_range, timeout=timeout, concurrency=concurrency,
+        )
+    else:
+        found = await _discover_broadcast(timeout=timeout)
 
-    return sorted(devices, key=lambda d: (d["name"] or "").lower())
+    await _update_all(found)
+    devices = _build_infos(found, include_energy=include_energy)
+    await _disconnect_all(found.values())
+    return devices
 
 
 # ---------------------------------------------------------------------------
 # Device control
 # ---------------------------------------------------------------------------
 
-async def _find_device(name_or_ip: str, timeout: int = 5):
-    """Locate a single device by IP address or partial name match."""
+def _cached_matches(needle: str) -> list[dict]:
+    """Rows of the name cache whose name contains *needle*."""
+    try:
+        with open(NAME_CACHE, newline="") as f:
+            return [
+                row for row in csv.DictReader(f)
+                if needle in (row.get("name") or "").lower()
+            ]
+    except (OSError, csv.Error):
+        return []
+
 
-    # IP address?
-    parts = name_or_ip.split(".")
-    if len(parts) == 4 and all(p.isdigit() for p in parts):
-        try:
-            dev = await Discover.discover_single(name_or_ip, timeout=timeout)
-            await dev.update()
-            return dev
-        except Exception as e:
-            print(f"Could not reach {name_or_ip}: {e}", file=sys.stderr)
-            return None
+async def _find_cached_device(needle: str, timeout: int = 5):
+    """Connect straight to the IP recorded for *needle* in the name cache.
 
-    # Name search — scan the network and match
-    found = await Discover.discover(timeout=timeout)
-    needle = name_or_ip.lower()
-    matches: list[tuple[str, object]] = []
+    Returns None on a cache miss, an ambiguous match, an unreachable IP, or
+    when a different device (by MAC) now answers at that address.
+    """
+    from kasa import Discover
 
-    for ip, dev in found.items():
+    cached = _cached_matches(needle)
+    if len(cached) != 1:
+        return None
+    row = cached[0]
+
+    try:
+        dev = await Discover.discover_single(
+            row["ip"], timeout=timeout, discovery_timeout=timeout,
+        )
+        await dev.update()
+    except Exception:
+        return None
+
+    alias = (_safe(dev, "alias") or "").lower()
+    if _safe(dev, "mac") == row.get("mac") and needle in alias:
+        return dev
+
+    try:
+        await dev.disconnect()
+    except Exception:
+        pass
+    return None
+
+
+# After the last name match, keep listening this long so a second device
+# matching the same text is still reported as ambiguous.
+_MATCH_GRACE = 0.5
+
+
+async def _discover_until_match(needles: list[str], timeout: int = 5) -> dict:
+    """Broadcast, stopping early once every needle is in some device's alias.
+
+    Devices are updated as they answer, and a device only counts once its
+    update has finished — so before stopping we also wait for every update
+    still in flight, in case a slower device matches too. Returns every
+    device seen, by IP.
+    """
+    found: dict = {}
+    checks: list[asyncio.Task] = []
+    pending = set(needles)
+    matched = asyncio.Event()
+
+    async def check(dev) -> None:
         try:
             await dev.update()
         except Exception:
-            pass
+            return
         alias = (_safe(dev, "alias") or "").lower()
-        if needle in alias:
-            matches.append((ip, dev))
+        pending.difference_update([n for n in pending if n in alias])
+        if not pending:
+            matched.set()
 
-    # Disconnect non-matches
-    for ip, dev in found.items():
-        if not any(ip == m[0] for m in matches):
-            try:
-                await dev.disconnect()
-            except Exception:
-                pass
+    async def on_discovered(dev) -> None:
+        if dev.host in found:  # same device answering on another interface
+            return
+        found[dev.host] = dev
+        task = asyncio.create_task(check(dev))
+        checks.append(task)
+        # wait() rather than await: if discovery tears this callback down,
+        # the check keeps running under our control instead of being cancelled
+        await asyncio.wait({task})
+
+    discovery = asyncio.create_task(
+        _discover_broadcast(timeout=timeout, on_discovered=on_discovered)
+    )
+    match_wait = asyncio.create_task(matched.wait())
+    await asyncio.wait({discovery, match_wait}, return_when=asyncio.FIRST_COMPLETED)
+    if matched.is_set() and not discovery.done():
+        await asyncio.wait({discovery}, timeout=_MATCH_GRACE)
+
+    # Let updates already under way finish (bounded by the timeout); new
+    # answers arriving meanwhile are picked up on the next pass
+    deadline = asyncio.get_running_loop().time() + timeout
+    while busy := {t for t in checks if not t.done()}:
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            break
+        await asyncio.wait(busy, timeout=remaining)
+
+    # Anything still running is abandoned; its device is disconnected by
+    # the caller, so don't leave an update racing that
+    leftovers = [discovery, match_wait, *(t for t in checks if not t.done())]
+    for task in leftovers:
+        task.cancel()
+    await asyncio.gather(*leftovers, return_exceptions=True)
+    return found
+
+
+def _is_ip(text: str) -> bool:
+    try:
+        ipaddress.ip_address(text)
+        return True
+    except ValueError:
+        return False
 
-    if not matches:
-        print(f"No device matching '{name_or_ip}' found.", file=sys.stderr)
-        return None
 
-    if len(matches) > 1:
-        print(f"Multiple devices match '{name_or_ip}':", file=sys.stderr)
-        for ip, dev in matches:
-            print(f"  {_safe(dev, 'alias', 'Unknown')} ({ip})", file=sys.stderr)
-            try:
-                await dev.disconnect()
-            except Exception:
-                pass
-        print("Be more specific.", file=sys.stderr)
+async def _connect_ip(ip: str, timeout: int = 5):
+    from kasa import Discover
+
+    try:
+        dev = await Discover.discover_single(
+            ip, timeout=timeout, discovery_timeout=timeout,
+        )
+        await dev.update()
+        return dev
+    except Exception as e:
+        print(f"Could not reach {ip}: {e}", file=sys.stderr)
         return None
 
-    return matches[0][1]
 
+async def _find_devices(targets: list[str], timeout: int = 5) -> tuple[list, bool]:
+    """Locate one device per target, given as an IP address or partial name.
 
-async def control_device(name_or_ip: str, action: str, timeout: int = 5) -> None:
-    dev = await _find_device(name_or_ip, timeout=timeout)
-    if dev is None:
-        sys.exit(1)
+    Names not resolved from the name cache share a single broadcast. Returns the
+    devices found (each at most once) and whether every target resolved.
+    """
+    ips = [t for t in targets if _is_ip(t)]
+    names = [t for t in targets if not _is_ip(t)]
+
+    ip_devs = await _gather_settled(_connect_ip(ip, timeout=timeout) for ip in ips)
+    ok = all(dev is not None for dev in ip_devs)
+
+    # Last full scan knows where these devices live — skip the broadcast for them
+    cached = await _gather_settled(
+        _find_cached_device(name.lower(), timeout=timeout) for name in names
+    )
+    resolved = [dev for dev in ip_devs + cached if dev is not None]
+    unresolved = [name for name, dev in zip(names, cached) if dev is None]
+
+    # Name search — one broadcast for every remaining name
+    if unresolved:
+        found = await _discover_until_match(
+            [name.lower() for name in unresolved], timeout=timeout,
+        )
+        used: set[str] = set()
+        for name in unresolved:
+            needle = name.lower()
+            matches = [
+                (ip, dev) for ip, dev in found.items()
+                if needle in (_safe(dev, "alias") or "").lower()
+            ]
+            if not matches:
+                print(f"No device matching '{name}' found.", file=sys.stderr)
+                ok = False
+            elif len(matches) > 1:
+                print(f"Multiple devices match '{name}':", file=sys.stderr)
+                for ip, dev in matches:
+                    print(f"  {_safe(dev, 'alias', 'Unknown')} ({ip})",
+                          file=sys.stderr)
+                print("Be more specific.", file=sys.stderr)
+                ok = False
+            else:
+                ip, dev = matches[0]
+                resolved.append(dev)
+                used.add(ip)
+
+        await _disconnect_all(dev for ip, dev in found.items() if ip not in used)
+
+    # Two targets may name the same device; act on it once
+    unique: dict = {}
+    dupes = []
+    for dev in resolved:
+        first = unique.setdefault(dev.host, dev)
+        if first is not dev:
+            dupes.append(dev)
+    await _disconnect_all(dupes)
 
+    return list(unique.values()), ok
+
+
+async def _apply_action(dev, action: str, verify: bool = False) -> bool:
     alias = _safe(dev, "alias", dev.host)
     try:
-        if action == "on":
+        # State was already fetched during lookup, so toggle needs no re-query
+        turn_on = action == "on" or (
+            action == "toggle" and not _safe(dev, "is_on", False)
+        )
+        if turn_on:
             await dev.turn_on()
-            await dev.update()
-            print(f"✓ {alias} → ON")
-        elif action == "off":
+        else:
             await dev.turn_off()
+
+        is_on = turn_on
+        if verify:
             await dev.update()
-            print(f"✓ {alias} → OFF")
-        elif action == "toggle":
-            if _safe(dev, "is_on", False):
-                await dev.turn_off()
-                await dev.update()
-                print(f"✓ {alias} → OFF")
-            else:
-                await dev.turn_on()
-                await dev.update()
-                print(f"✓ {alias} → ON")
+            is_on = _safe(dev, "is_on", False)
+        print(f"✓ {alias} → {'ON' if is_on else 'OFF'}")
+        return True
     except Exception as e:
         print(f"✗ Failed to {action} {alias}: {e}", file=sys.stderr)
-        sys.exit(1)
+        return False
+
+
+async def control_devices(
+    targets: list[str],
+    action: str,
+    timeout: int = 5,
+    verify: bool = False,
+) -> None:
+    """Apply *action* to every target at once, after a single lookup pass."""
+    devs, ok = await _find_devices(targets, timeout=timeout)
+    try:
+        results = await _gather_settled(
+            _apply_action(dev, action, verify=verify) for dev in devs
+        )
     finally:
-        try:
-            await dev.disconnect()
-        except Exception:
-            pass
+        await _disconnect_all(devs)
+
+    if not ok or not all(r is True for r in results):
+        sys.exit(1)
+
+
+async def control_device(
+    name_or_ip: str,
+    action: str,
+    timeout: int = 5,
+    verify: bool = False,
+) -> None:
+    """Single-target form of control_devices, kept for code importing kasa_scan."""
+    await control_devices([name_or_ip], action, timeout=timeout, verify=verify)
 
 
 # ---------------------------------------------------------------------------
@@ -293,22 +616,24 @@ def print_table(devices: list[dict], energy: bool = False) -> None:
             ("kWh", "total_kwh", 8),
         ]
 
-    header = "  ".join(f"{lbl:<{w}}" for lbl, _, w in cols)
-    print(header)
-    print("─" * len(header))
-    for d in devices:
-        row = "  ".join(f"{_fmt(d.get(k)):<{w}}" for _, k, w in cols)
-        print(row)
+    row_fmt = "  ".join(f"{{:<{w}}}" for _, _, w in cols)
+    keys = [k for _, k, _ in cols]
+
+    header = row_fmt.format(*(lbl for lbl, _, _ in cols))
+    lines = [header, "─" * len(header)]
+    lines.extend(
+        row_fmt.format(*(_fmt(d.get(k)) for k in keys)) for d in devices
+    )
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def to_json(devices: list[dict]) -> str:
-    return json.dumps(
+    return _json_dumps(
         {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": _now_iso(),
             "device_count": len(devices),
             "devices": devices,
-        },
-        indent=2,
+        }
     )
 
 
@@ -325,30 +650,60 @@ def to_csv_string(devices: list[dict], energy: bool = False) -> str:
 # Running CSV
 # ---------------------------------------------------------------------------
 
+# Kept open across calls so watch mode appends to the same handle each tick
+_scan_log_file = None
+
+
+def _open_scan_log():
+    """Return the append handle for SCAN_LOG, opening it on first use."""
+    global _scan_log_file
+    if _scan_log_file is None or _scan_log_file.closed:
+        _scan_log_file = open(SCAN_LOG, "a", newline="")
+        atexit.register(_scan_log_file.close)
+    return _scan_log_file
+
+
 def save_running_csv(devices: list[dict]) -> None:
     """Overwrite ~/.kasa_scan/devices.csv with latest snapshot and append to
     the historical scan log."""
     _ensure_data_dir()
-    ts = datetime.now(timezone.utc).isoformat()
+    ts = _now_iso()
 
     has_energy = any(d.get("power_w") is not None for d in devices)
     fields = _STATUS_FIELDS + (_ENERGY_FIELDS if has_energy else [])
+    header = ["timestamp"] + fields
+
+    # Built once, shared by both files
+    rows = [(ts, *(d.get(k) for k in fields)) for d in devices]
 
     # Latest snapshot (overwrite)
     with open(DEVICES_CSV, "w", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=["timestamp"] + fields, extrasaction="ignore")
-        w.writeheader()
-        for d in devices:
-            w.writerow({"timestamp": ts, **d})
-
-    # Append to history log
-    write_header = not SCAN_LOG.exists() or SCAN_LOG.stat().st_size == 0
-    with open(SCAN_LOG, "a", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=["timestamp"] + fields, extrasaction="ignore")
-        if write_header:
-            w.writeheader()
-        for d in devices:
-            w.writerow({"timestamp": ts, **d})
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+
+    # Append to history log — an append handle sits at EOF, so tell() == 0
+    # means the file is new or empty and needs a header
+    f = _open_scan_log()
+    w = csv.writer(f)
+    if f.tell() == 0:
+        w.writerow(header)
+    w.writerows(rows)
+    f.flush()
+
+
+def save_name_cache(devices: list[dict]) -> None:
+    """Record name → IP/MAC for control-by-name lookups.
+
+    Only pass the result of a complete broadcast scan: a name is trusted
+    from the cache only when it matches a single row, so a filtered or
+    single-IP/range scan here would hide other devices sharing that name.
+    """
+    _ensure_data_dir()
+    with open(NAME_CACHE, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["name", "mac", "ip"])
+        w.writerows((d["name"], d["mac"], d["ip"]) for d in devices)
 
 
 # ---------------------------------------------------------------------------
@@ -381,84 +736,148 @@ def sort_devices(devices: list[dict], key: str) -> list[dict]:
 def save_baseline(devices: list[dict]) -> None:
     _ensure_data_dir()
     data = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": _now_iso(),
         "devices": devices,
     }
-    BASELINE_FILE.write_text(json.dumps(data, indent=2))
+    # Device names may be non-ASCII; write UTF-8, not the locale encoding.
+    BASELINE_FILE.write_text(_json_dumps(data), encoding="utf-8")
     print(f"Baseline saved ({len(devices)} devices) → {BASELINE_FILE}")
 
 
 def load_baseline() -> dict | None:
     if not BASELINE_FILE.exists():
         return None
-    return json.loads(BASELINE_FILE.read_text())
+    return _json_loads(BASELINE_FILE.read_bytes())
 
 
 def print_diff(current: list[dict], baseline: dict) -> None:
     bl = {d["mac"]: d for d in baseline["devices"]}
     cur = {d["mac"]: d for d in current}
 
-    new_devs = [d for mac, d in cur.items() if mac not in bl]
+    # One walk over the current devices, in display order, classifies each
+    # MAC as new or compares it against its baseline entry.
+    new_devs: list[dict] = []
+    ip_changes: list[tuple[dict, dict]] = []
+    name_changes: list[tuple[dict, dict]] = []
+    for mac, new_d in cur.items():
+        old = bl.get(mac)
+        if old is None:
+            new_devs.append(new_d)
+            continue
+        if new_d["ip"] != old["ip"]:
+            ip_changes.append((old, new_d))
+        if new_d["name"] != old["name"]:
+            name_changes.append((old, new_d))
     missing = [d for mac, d in bl.items() if mac not in cur]
-    ip_changes = [
-        (bl[mac], cur[mac])
-        for mac in cur
-        if mac in bl and cur[mac]["ip"] != bl[mac]["ip"]
-    ]
-    name_changes = [
-        (bl[mac], cur[mac])
-        for mac in cur
-        if mac in bl and cur[mac]["name"] != bl[mac]["name"]
-    ]
 
-    print(f"Baseline : {baseline['timestamp']}  ({len(bl)} devices)")
-    print(f"Current  : {datetime.now(timezone.utc).isoformat()}  ({len(cur)} devices)")
-    print()
+    lines = [
+        f"Baseline : {baseline['timestamp']}  ({len(bl)} devices)",
+        f"Current  : {_now_iso()}  ({len(cur)} devices)",
+        "",
+    ]
 
     if not any([new_devs, missing, ip_changes, name_changes]):
-        print("No changes detected.")
-        return
+        lines.append("No changes detected.")
 
     if new_devs:
-        print(f"  + {len(new_devs)} NEW device(s):")
-        for d in new_devs:
-            print(f"    + {d['name']}  {d['mac']}  {d['ip']}")
-        print()
+        lines.append(f"  + {len(new_devs)} NEW device(s):")
+        lines.extend(f"    + {d['name']}  {d['mac']}  {d['ip']}" for d in new_devs)
+        lines.append("")
 
     if missing:
-        print(f"  − {len(missing)} MISSING device(s):")
-        for d in missing:
-            print(f"    − {d['name']}  {d['mac']}  was {d['ip']}")
-        print()
+        lines.append(f"  − {len(missing)} MISSING device(s):")
+        lines.extend(f"    − {d['name']}  {d['mac']}  was {d['ip']}" for d in missing)
+        lines.append("")
 
     if ip_changes:
-        print(f"  ~ {len(ip_changes)} IP change(s):")
-        for old, new_d in ip_changes:
-            print(f"    ~ {new_d['name']}: {old['ip']} → {new_d['ip']}")
-        print()
+        lines.append(f"  ~ {len(ip_changes)} IP change(s):")
+        lines.extend(
+            f"    ~ {new_d['name']}: {old['ip']} → {new_d['ip']}"
+            for old, new_d in ip_changes
+        )
+        lines.append("")
 
     if name_changes:
-        print(f"  ~ {len(name_changes)} name change(s):")
-        for old, new_d in name_changes:
-            print(f"    ~ {old['name']} → {new_d['name']}  ({new_d['mac']})")
+        lines.append(f"  ~ {len(name_changes)} name change(s):")
+        lines.extend(
+            f"    ~ {old['name']} → {new_d['name']}  ({new_d['mac']})"
+            for old, new_d in name_changes
+        )
+
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 # ---------------------------------------------------------------------------
 # Watch mode
 # ---------------------------------------------------------------------------
 
+# Full broadcast cadence in watch mode; ticks in between only poll the devices
+# already found, over their open connections.
+REDISCOVER_INTERVAL = 60
+
+
+async def _refresh_pool(pool: dict, healthy: set[str], timeout: int = 5) -> dict:
+    """Rediscover, keeping an existing connection only where it still works.
+
+    A pooled device is reused if it was healthy on the last tick and the
+    device now answering at its IP has the same MAC; otherwise (DHCP swap,
+    broken connection) it is disconnected and replaced by the fresh one.
+    """
+    found = await _discover_broadcast(timeout=timeout)
+    fresh: dict = {}
+    for ip, dev in found.items():
+        old = pool.get(ip)
+        mac = _safe(dev, "mac")
+        if old is not None and ip in healthy and mac and _safe(old, "mac") == mac:
+            fresh[ip] = old
+        else:
+            fresh[ip] = dev
+    await _disconnect_all(
+        old for ip, old in pool.items() if fresh.get(ip) is not old
+    )
+    return fresh
+
+
+def _clear_screen() -> None:
+    """Home the cursor and clear to end of screen, without forking `clear`."""
+    sys.stdout.write("\x1b[H\x1b[J")
+    sys.stdout.flush()
+
+
 async def watch_loop(
     timeout: int = 5,
     interval: int = 5,
     energy: bool = False,
 ) -> None:
+    if os.name == "nt":
+        os.system("")  # enables VT escape sequences in the Windows console
     print(f"Watching Kasa devices every {interval}s  (Ctrl-C to stop)\n")
+    pool: dict = {}
+    healthy: set[str] = set()
+    next_discovery = 0.0
     try:
         while True:
-            devices = await discover_devices(
-                timeout=timeout, include_energy=energy,
-            )
-            os.system("clear" if os.name != "nt" else "cls")
+            rediscovered = time.monotonic() >= next_discovery
+            if rediscovered:
+                pool = await _refresh_pool(pool, healthy, timeout=timeout)
+                next_discovery = time.monotonic() + REDISCOVER_INTERVAL
+
+            results = await _update_all(pool)
+            now_healthy = {
+                ip for ip, r in zip(pool, results)
+                if not isinstance(r, BaseException)
+            }
+            # A device that was answering and just dropped off may have moved —
+            # rediscover next tick. Ones that never answer (e.g. KLAP without
+            # credentials) don't re-trigger the broadcast every time.
+            if (healthy & pool.keys()) - now_healthy:
+                next_discovery = 0.0
+            healthy = now_healthy
+
+            devices = _build_infos(pool, include_energy=energy)
+            if rediscovered:
+                save_name_cache(devices)
+            _clear_screen()
             ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             print(f"kasa-scan watch — {ts}  (every {interval}s, Ctrl-C to stop)")
             print(f"Found {len(devices)} device(s)\n")
@@ -468,12 +887,31 @@ async def watch_loop(
             await asyncio.sleep(interval)
     except (KeyboardInterrupt, asyncio.CancelledError):
         print("\nStopped.")
+    finally:
+        await _disconnect_all(pool.values())
 
 
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
+def _cidr(text: str) -> ipaddress.IPv4Network:
+    try:
+        return ipaddress.IPv4Network(text, strict=False)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _positive_int(text: str) -> int:
+    try:
+        n = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {text!r}") from None
+    if n < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return n
+
+
 def _build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         prog="kasa-scan",
@@ -490,8 +928,15 @@ def _build_parser() -> argparse.ArgumentParser:
                    help="Show only devices whose name contains TEXT")
     s.add_argument("--type", dest="type_filter", metavar="TYPE",
                    help="Show only devices of TYPE (plug, bulb, etc.)")
-    s.add_argument("--ip", dest="target_ip", metavar="IP",
-                   help="Query a single device by IP")
+    target = s.add_mutually_exclusive_group()
+    target.add_argument("--ip", dest="target_ip", metavar="IP",
+                        help="Query a single device by IP")
+    target.add_argument("--range", dest="target_range", metavar="CIDR",
+                        type=_cidr,
+                        help="Probe every address in CIDR instead of broadcasting")
+    s.add_argument("--concurrency", type=_positive_int, default=DEFAULT_CONCURRENCY,
+                   metavar="N",
+                   help=f"Max in-flight probes for --range (default: {DEFAULT_CONCURRENCY})")
     s.add_argument("--sort", choices=["name", "ip", "mac", "model", "type"],
                    default="name")
     s.add_argument("--energy", action="store_true",
@@ -499,9 +944,12 @@ def _build_parser() -> argparse.ArgumentParser:
 
     # ── on / off / toggle ─────────────────────────────────────────────────
     for action in ("on", "off", "toggle"):
-        a = sub.add_parser(action, help=f"Turn a device {action}")
-        a.add_argument("device", help="Device name (partial match) or IP address")
+        a = sub.add_parser(action, help=f"Turn one or more devices {action}")
+        a.add_argument("devices", nargs="+", metavar="device",
+                       help="Device name (partial match) or IP address")
         a.add_argument("-t", "--timeout", type=int, default=5)
+        a.add_argument("--verify", action="store_true",
+                       help="Re-read the device afterwards to confirm its state")
 
     # ── watch ─────────────────────────────────────────────────────────────
     w = sub.add_parser("watch", help="Live-updating device monitor")
@@ -522,85 +970,123 @@ def _build_parser() -> argparse.ArgumentParser:
     return p
 
 
+@contextlib.contextmanager
+def _event_loop():
+    """One event loop for the whole command; yields its ``run`` callable."""
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner() as runner:
+            yield runner.run
+    else:
+        # Same teardown as asyncio.run: on Ctrl-C, cancelling the pending
+        # tasks is what lets them handle CancelledError and clean up
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            yield loop.run_until_complete
+        finally:
+            try:
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                loop.run_until_complete(
+                    asyncio.gather(*pending, return_exceptions=True)
+                )
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.run_until_complete(loop.shutdown_default_executor())
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
+
+
 def main() -> None:
     parser = _build_parser()
     args = parser.parse_args()
     cmd = args.command or "scan"
 
-    # ── scan (default) ────────────────────────────────────────────────────
-    if cmd == "scan":
-        timeout = getattr(args, "timeout", 5)
-        target_ip = getattr(args, "target_ip", None)
-        energy = getattr(args, "energy", False)
-        name_filter = getattr(args, "name_filter", None)
-        type_filter = getattr(args, "type_filter", None)
-        sort_key = getattr(args, "sort", "name")
-        fmt = getattr(args, "format", "table")
-        output = getattr(args, "output", None)
-
-        devices = asyncio.run(
-            discover_devices(timeout=timeout, target_ip=target_ip,
-                             include_energy=energy)
-        )
-        if not devices:
-            print("No Kasa devices found on the network.", file=sys.stderr)
-            sys.exit(1)
-
-        devices = filter_devices(devices, name_filter, type_filter)
-        if sort_key != "name":
-            devices = sort_devices(devices, sort_key)
-
-        # Always save running CSV
-        save_running_csv(devices)
-
-        if fmt == "json":
-            text = to_json(devices)
-        elif fmt == "csv":
-            text = to_csv_string(devices, energy=energy)
-        else:
-            print(f"\nFound {len(devices)} Kasa device(s):\n")
-            print_table(devices, energy=energy)
-            print(f"\n📄 {DEVICES_CSV}")
-            return
-
-        if output:
-            Path(output).write_text(text)
-            print(f"Wrote {len(devices)} devices → {output}")
-        else:
-            print(text)
-
-    # ── on / off / toggle ─────────────────────────────────────────────────
-    elif cmd in ("on", "off", "toggle"):
-        asyncio.run(control_device(args.device, cmd, timeout=args.timeout))
-
-    # ── watch ─────────────────────────────────────────────────────────────
-    elif cmd == "watch":
-        asyncio.run(watch_loop(
-            timeout=args.timeout,
-            interval=args.interval,
-            energy=getattr(args, "energy", False),
-        ))
-
-    # ── baseline ──────────────────────────────────────────────────────────
-    elif cmd == "baseline":
-        devices = asyncio.run(discover_devices(timeout=args.timeout))
-        if not devices:
-            print("No devices found.", file=sys.stderr)
-            sys.exit(1)
-        save_baseline(devices)
+    with _event_loop() as run:
+        # ── scan (default) ────────────────────────────────────────────────
+        if cmd == "scan":
+            timeout = getattr(args, "timeout", 5)
+            target_ip = getattr(args, "target_ip", None)
+            target_range = getattr(args, "target_range", None)
+            concurrency = getattr(args, "concurrency", DEFAULT_CONCURRENCY)
+            energy = getattr(args, "energy", False)
+            name_filter = getattr(args, "name_filter", None)
+            type_filter = getattr(args, "type_filter", None)
+            sort_key = getattr(args, "sort", "name")
+            fmt = getattr(args, "format", "table")
+            output = getattr(args, "output", None)
+
+            devices = run(
+                discover_devices(timeout=timeout, target_ip=target_ip,
+                                 include_energy=energy, target_range=target_range,
+                                 concurrency=concurrency)
+            )
+            if not devices:
+                print("No Kasa devices found on the network.", file=sys.stderr)
+                sys.exit(1)
+            if not target_ip and not target_range:
+                save_name_cache(devices)
+
+            devices = filter_devices(devices, name_filter, type_filter)
+            if sort_key != "name":
+                devices = sort_devices(devices, sort_key)
+
+            # Always save running CSV
+            save_running_csv(devices)
+
+            if fmt == "json":
+                text = to_json(devices)
+            elif fmt == "csv":
+                text = to_csv_string(devices, energy=energy)
+            else:
+                print(f"\nFound {len(devices)} Kasa device(s):\n")
+                print_table(devices, energy=energy)
+                print(f"\n📄 {DEVICES_CSV}")
+                return
 
-    # ── diff ──────────────────────────────────────────────────────────────
-    elif cmd == "diff":
-        bl = load_baseline()
-        if bl is None:
-            print("No baseline found. Run 'kasa-scan baseline' first.",
-                  file=sys.stderr)
-            sys.exit(1)
-        devices = asyncio.run(discover_devices(timeout=args.timeout))
-        if not devices:
-            print("No devices found.", file=sys.stderr)
-            sys.exit(1)
-        print_diff(devices, bl)
+            if output:
+                # JSON/CSV keep non-ASCII names as-is, so write UTF-8.
+                Path(output).write_text(text, encoding="utf-8")
+                print(f"Wrote {len(devices)} devices → {output}")
+            else:
+                print(text)
+
+        # ── on / off / toggle ─────────────────────────────────────────────
+        elif cmd in ("on", "off", "toggle"):
+            run(control_devices(args.devices, cmd, timeout=args.timeout,
+                                verify=args.verify))
+
+        # ── watch ─────────────────────────────────────────────────────────
+        elif cmd == "watch":
+            run(watch_loop(
+                timeout=args.timeout,
+                interval=args.interval,
+                energy=getattr(args, "energy", False),
+            ))
+
+        # ── baseline ──────────────────────────────────────────────────────
+        elif cmd == "baseline":
+            devices = run(discover_devices(timeout=args.timeout))
+            if not devices:
+                print("No devices found.", file=sys.stderr)
+                sys.exit(1)
+            save_name_cache(devices)
+            save_baseline(devices)
+
+        # ── diff ──────────────────────────────────────────────────────────
+        elif cmd == "diff":
+            bl = load_baseline()
+            if bl is None:
+                print("No baseline found. Run 'kasa-scan baseline' first.",
+                      file=sys.stderr)
+                sys.exit(1)
+            devices = run(discover_devices(timeout=args.timeout))
+            if not devices:
+                print("No devices found.", file=sys.stderr)
+                sys.exit(1)
+            save_name_cache(devices)
+            print_diff(devices, bl)
 
 
 if __name__ == "__main__":